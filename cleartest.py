@@ -1,6 +1,7 @@
 from fnmatch import fnmatch
 from random import shuffle
 import inspect
+import functools
 import traceback
 import argparse
 import glob2
@@ -9,6 +10,14 @@ import sys
 import datetime
 import platform
 import imp
+import ast
+import time
+import importlib
+import importlib.util
+import sysconfig
+import site
+import hashlib
+import pickle
 import colorama
 
 
@@ -21,6 +30,11 @@ class _g(object):
     clargs = None # Command-line args
     verbosity = 2 # 2: normal, 1: minimal, 0: quiet
     multi = False # This gets set to True in go() if we're running more than 1 script.
+    watch_interval = 1 # Seconds between polls in watch mode.
+    pid = None # The process go() was called in.
+    fixtures = {} # Fixture definitions, keyed by (file, function name)
+    fixture_values = {} # Built fixture values, keyed like fixtures, in the order they were built
+    finalizer_pid = None # The forked child, if any, that has registered fixture teardown at exit
 
 
 class _Run(object):
@@ -416,6 +430,7 @@ def _runtests(scripts):
                 print(colorama.Fore.MAGENTA + traceback.format_exc())
             _Newline.set(False)
             _g.overall_run.complete_failures.append('{}/{}.py'.format(script['path'], script['module']))
+            _teardown_fixtures(['script'], _g.script_run)
         else:
             try:
                 test_main_default_args = inspect.getfullargspec(test_main_obj).defaults
@@ -430,6 +445,7 @@ def _runtests(scripts):
             except:
                 _g.script_run.log_error()
 
+            _teardown_fixtures(['script'], _g.script_run)
             _g.script_run.collect()
             if (not _g.multi or (_g.multi and _g.verbosity == 2)) and not (_g.clargs.parallel and _g.verbosity < 2):
                 _g.script_run.summarize()
@@ -440,7 +456,7 @@ def _runtests(scripts):
     return _g.overall_run
 
 
-def _parse_cl(paths=None, suite_file=None, recursive=None, parallel=None, minimal=None, quiet=None, timestamp=None, strip=False):
+def _parse_cl(paths=None, suite_file=None, recursive=None, parallel=None, minimal=None, quiet=None, timestamp=None, strip=False, watch=None, prebuild=None):
     '''
     Parses the command line for arguments and figures out which scripts to run.
     Called from go().
@@ -454,6 +470,8 @@ def _parse_cl(paths=None, suite_file=None, recursive=None, parallel=None, minima
     parser.add_argument('--quiet', '-q', action='store_true', help='Quiet output, i.e. overview & summary information only')
     parser.add_argument('--timestamp', '-t', action='store_true', help='Print time stamp between each script.')
     parser.add_argument('--strip', '-s', action='store_true', help='Strip color from output. Removes color escape sequences from logged output.')
+    parser.add_argument('--prebuild', '-b', action='store_true', help='In parallel runs, import each script once up front to build its run-scoped fixtures before forking.')
+    parser.add_argument('--watch', '-w', action='store_true', help='Keep running and rerun affected scripts whenever they or the local modules they import change.')
     _g.clargs = parser.parse_args()
 
     if paths: _g.clargs.paths = paths
@@ -464,6 +482,8 @@ def _parse_cl(paths=None, suite_file=None, recursive=None, parallel=None, minima
     if quiet: _g.clargs.quiet = quiet
     if timestamp: _g.clargs.timestamp = timestamp
     if strip: _g.clargs.strip = strip
+    if watch: _g.clargs.watch = watch
+    if prebuild: _g.clargs.prebuild = prebuild
 
     # May remove -q & -m in favor of -v 0 & -v 1.
     if _g.clargs.quiet: _g.verbosity = 0
@@ -568,6 +588,198 @@ def run_class(test_obj):
         method()
 
 
+def fixture(scope='script', teardown=None, cache=False):
+    '''
+    Decorate setup functions with this to build their values once per scope and reuse
+    them. Call the decorated function to get the value. Scopes:
+        script - Once per script run.
+        worker - Once per process, i.e. once per parallel worker.
+        run - Once per call to go(). In parallel runs it's built before forking if it's
+              defined in a module the scripts import. Defined in a script itself, it's
+              built once per worker unless --prebuild is set.
+    teardown is called with the value when its scope ends. cache=True pickles the value
+    to disk so later runs can load it instead of rebuilding it. A bare @fixture works
+    too and uses the defaults.
+    '''
+    if callable(scope): # Used as @fixture rather than @fixture(...)
+        return fixture()(scope)
+    if scope not in ('run', 'worker', 'script'):
+        raise ValueError("scope must be 'run', 'worker' or 'script', not {!r}.".format(scope))
+
+    def _decorate(setup_function):
+        # Scripts are reimported in each parallel worker, so key on where the function
+        # lives rather than on the function object itself.
+        key = (os.path.abspath(setup_function.__code__.co_filename), setup_function.__qualname__)
+        _g.fixtures[key] = {'function': setup_function, 'scope': scope, 'teardown': teardown, 'cache': cache}
+
+        @functools.wraps(setup_function)
+        def _get():
+            return _fixture_value(key)
+        return _get
+    return _decorate
+
+
+def _fixture_value(key):
+    '''
+    Returns a fixture's value, building it if it hasn't been built in this scope yet.
+    '''
+    definition = _g.fixtures[key]
+    if key in _g.fixture_values:
+        value, pid = _g.fixture_values[key]
+        # Only run values are shared with forked children. Worker & script values
+        # inherited from the parent process don't count.
+        if definition['scope'] == 'run' or pid == os.getpid():
+            return value
+
+    if definition['cache']:
+        value = _cached_fixture_value(definition)
+    else:
+        value = definition['function']()
+    _g.fixture_values.pop(key, None)
+    _g.fixture_values[key] = (value, os.getpid())
+
+    # In a forked child, tear down what it built when it exits.
+    if os.getpid() != _g.pid and _g.finalizer_pid != os.getpid():
+        from multiprocessing import util
+        util.Finalize(None, _teardown_fixtures, args=(['run', 'worker'],), exitpriority=0)
+        _g.finalizer_pid = os.getpid()
+    return value
+
+
+def _cached_fixture_value(definition):
+    '''
+    Loads a fixture's value from the disk cache, building and saving it if needed.
+    The cache file is named after a hash of the fixture's whole module so editing it
+    invalidates the cache. Edits to other modules or data files it reads don't.
+    '''
+    setup_function = definition['function']
+    module_path = os.path.abspath(setup_function.__code__.co_filename)
+    try:
+        with open(module_path, 'rb') as f:
+            source = f.read()
+    except (IOError, OSError):
+        source = setup_function.__code__.co_code
+    cache_dir = os.path.join(os.path.dirname(module_path), '.cleartest_cache')
+    # e.g. fixtures.dataset-<sha1>.pickle
+    prefix = '{}.{}-'.format(os.path.splitext(os.path.basename(module_path))[0], setup_function.__qualname__)
+    cache_name = '{}{}.pickle'.format(prefix, hashlib.sha1(source).hexdigest())
+    cache_path = os.path.join(cache_dir, cache_name)
+
+    try:
+        with open(cache_path, 'rb') as f:
+            return pickle.load(f)
+    except Exception: # Missing or unreadable. Rebuild it.
+        pass
+
+    value = setup_function()
+    # Write to a temp file first so parallel workers never read a partial cache file.
+    temp_path = '{}.{}'.format(cache_path, os.getpid())
+    try:
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir, exist_ok=True)
+        with open(temp_path, 'wb') as f:
+            pickle.dump(value, f)
+        os.replace(temp_path, cache_path)
+    except Exception: # e.g. It can't be pickled or the directory isn't writable. Use it uncached.
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return value
+
+    # Remove this fixture's caches from earlier versions of its module.
+    for name in os.listdir(cache_dir):
+        if name.startswith(prefix) and name.endswith('.pickle') and name != cache_name:
+            try:
+                os.remove(os.path.join(cache_dir, name))
+            except OSError: # Another worker got to it first.
+                pass
+    return value
+
+
+def _teardown_fixtures(scopes, script_run=None):
+    '''
+    Tears down fixture values in the given scopes that were built in this process, most
+    recently built first. Teardown exceptions count as errors in script_run if given.
+    '''
+    for key, (value, pid) in reversed(list(_g.fixture_values.items())):
+        definition = _g.fixtures[key]
+        if definition['scope'] not in scopes or pid != os.getpid():
+            continue
+        del _g.fixture_values[key]
+        if definition['teardown']:
+            try:
+                definition['teardown'](value)
+            except:
+                if script_run:
+                    script_run.log_error()
+                else:
+                    print(colorama.Fore.MAGENTA + traceback.format_exc())
+                    _Newline.set(False)
+
+
+def _import_local(file_path, search_dirs):
+    '''
+    Imports a local file by its module name relative to the first of search_dirs that
+    holds it, e.g. /path/to/lib/pkg/mod.py in /path/to/lib is imported as pkg.mod.
+    Used in parallel runs.
+    '''
+    for search_dir in search_dirs:
+        relative = os.path.relpath(file_path, search_dir)
+        if relative.startswith(os.pardir):
+            continue
+        name = os.path.splitext(relative)[0].replace(os.sep, '.')
+        if name.endswith('.__init__'):
+            name = name[:-len('.__init__')]
+        if name in sys.modules:
+            return
+        # The directory may only be on the path once the scripts themselves run.
+        added = search_dir not in sys.path
+        if added:
+            sys.path.insert(0, search_dir)
+        try:
+            importlib.import_module(name)
+        except: # The workers will report it.
+            pass
+        finally:
+            if added:
+                sys.path.remove(search_dir)
+        return
+
+
+def _prebuild_fixtures(scripts):
+    '''
+    Builds run-scoped fixtures so that parallel workers inherit them instead of each
+    building their own. Local modules the scripts import are imported here if they use
+    fixtures. The scripts themselves are only imported if --prebuild is set, since that
+    runs their module-level code an extra time. Called from go().
+    '''
+    script_paths = ['{}/{}.py'.format(script['path'], script['module']) for script in scripts]
+    path_dirs = [os.path.abspath(path_dir or '.') for path_dir in sys.path]
+    for script_path in script_paths:
+        search_dirs = path_dirs + [os.path.dirname(script_path), os.getcwd()]
+        for file_path in sorted(_dependencies(script_path, preload=False) - set(script_paths)):
+            try:
+                with open(file_path, 'rb') as f:
+                    uses_fixtures = b'fixture' in f.read()
+            except (IOError, OSError):
+                continue
+            if uses_fixtures:
+                _import_local(file_path, search_dirs)
+
+    if _g.clargs.prebuild:
+        for script in scripts:
+            try:
+                imp.load_source(script['module'], '{}/{}.py'.format(script['path'], script['module']))
+            except: # The workers will report it.
+                pass
+
+    for key, definition in list(_g.fixtures.items()):
+        if definition['scope'] == 'run':
+            try:
+                _fixture_value(key)
+            except Exception: # Leave it to the workers, which will log the error.
+                pass
+
+
 class _Newline(object):
     '''
     Intelligently figures out when to print a newline.
@@ -624,26 +836,260 @@ def _runtest_worker(script):
     return _runtests([script])
 
 
-def go(paths=None, suite_file=None, recursive=None, parallel=None, minimal=None, quiet=None, timestamp=None, strip=False):
+def _local_file(module, search_dirs):
+    '''
+    Returns the absolute path of a module found in one of search_dirs, or None if it
+    isn't local (i.e. it's installed or part of the standard library).
+    Used in watch mode.
+    '''
+    for search_dir in search_dirs:
+        base = os.path.join(search_dir, *module.split('.')) if module else search_dir
+        for candidate in (base + '.py', os.path.join(base, '__init__.py')):
+            if os.path.isfile(candidate):
+                return os.path.abspath(candidate)
+    return None
+
+
+def _installed_dirs():
+    '''
+    Returns the directories holding the standard library and installed packages.
+    Used in watch mode.
+    '''
+    paths = sysconfig.get_paths()
+    dirs = [paths[name] for name in ('stdlib', 'platstdlib', 'purelib', 'platlib') if name in paths]
+    try:
+        dirs.extend(site.getsitepackages())
+        dirs.append(site.getusersitepackages())
+    except AttributeError: # Some virtualenvs ship an old site module without these.
+        pass
+    return tuple(os.path.join(os.path.realpath(d), '') for d in dirs)
+
+
+def _module_root(module, installed_dirs):
+    '''
+    Returns the sys.path directory a module's top-level package resolves from, or None
+    if it's installed, part of the standard library, or can't be found.
+    Used in watch mode.
+    '''
+    top = module.split('.')[0]
+    if not top:
+        return None
+    try:
+        spec = importlib.util.find_spec(top)
+    except (ImportError, ValueError):
+        return None
+    if not spec or not spec.origin or not spec.origin.endswith('.py'):
+        return None
+    origin = os.path.realpath(spec.origin)
+    if origin.startswith(installed_dirs):
+        return None
+    root = os.path.dirname(origin)
+    if os.path.basename(origin) == '__init__.py':
+        root = os.path.dirname(root)
+    return root
+
+
+def _dependencies(script_path, preload=True):
+    '''
+    Returns the set of local files a script depends on, including the script itself.
+    With preload, installed and standard library modules it imports are imported here
+    so that forked children get them for free. Used in watch mode and parallel runs.
+    '''
+    search_dirs = [os.path.dirname(script_path), os.getcwd()]
+    installed_dirs = _installed_dirs()
+    dependencies = set()
+    queue = [script_path]
+    while queue:
+        file_path = queue.pop()
+        if file_path in dependencies:
+            continue
+        dependencies.add(file_path)
+        try:
+            with open(file_path) as f:
+                tree = ast.parse(f.read(), file_path)
+        except: # Unreadable or bad syntax. The child will report it when it runs.
+            continue
+
+        for node in ast.walk(tree):
+            # Build a list of module names this statement could load, e.g.
+            # `from pkg import mod` could load pkg and pkg.mod.
+            if isinstance(node, ast.Import):
+                modules = [alias.name for alias in node.names]
+                external = modules
+                level = 0
+                dirs = search_dirs
+            elif isinstance(node, ast.ImportFrom):
+                prefix = node.module + '.' if node.module else ''
+                modules = [node.module or ''] + [prefix + alias.name for alias in node.names if alias.name != '*']
+                external = [node.module] if node.module and not node.level else []
+                level = node.level
+                dirs = search_dirs
+                if level: # Relative import
+                    relative_dir = os.path.dirname(file_path)
+                    for _ in range(level - 1):
+                        relative_dir = os.path.dirname(relative_dir)
+                    dirs = [relative_dir]
+            else:
+                continue
+
+            for module in modules:
+                parts = module.split('.') if module else ['']
+                if not level:
+                    # Also look wherever it resolves on sys.path, e.g. helpers on PYTHONPATH.
+                    root = _module_root(module, installed_dirs)
+                    dirs = search_dirs + [root] if root else search_dirs
+                # Include parent packages, e.g. pkg/__init__.py for pkg.mod.
+                local = [_local_file('.'.join(parts[:i]), dirs) for i in range(1, len(parts) + 1)]
+                # cleartest itself is never reloaded; children share its state with us.
+                local = [path for path in local if path and os.path.realpath(path) != os.path.realpath(__file__)]
+                if local:
+                    queue.extend(local)
+                elif preload and module in external:
+                    try:
+                        importlib.import_module(module)
+                    except Exception:
+                        pass
+    return dependencies
+
+
+def _mtime(file_path):
+    '''
+    Returns a file's modification time, or None if it's gone missing.
+    '''
+    try:
+        return os.stat(file_path).st_mtime
+    except OSError:
+        return None
+
+
+def _watch_worker(script, sender, dependencies):
+    '''
+    Runs a single script in a forked child and sends its results back to the parent.
+    Used in watch mode.
+    '''
+    # Forget local modules the parent imported (e.g. a custom runner's helpers) so the
+    # script gets their current code rather than the parent's stale copy.
+    dependencies = set(os.path.realpath(file_path) for file_path in dependencies)
+    for name, module in list(sys.modules.items()):
+        file_path = getattr(module, '__file__', None)
+        if file_path and os.path.realpath(file_path) in dependencies:
+            del sys.modules[name]
+
+    _g.overall_run = _OverallRun()
+    sender.send(_runtests([script]))
+    sender.close()
+
+
+def _watch_run(scripts, dependencies):
+    '''
+    Runs each script in its own freshly forked child so that local modules are always
+    reimported. Output is printed as each child runs. Called from _watch().
+    '''
+    from multiprocessing import get_context
+    context = get_context('fork')
+
+    _g.overall_run = _OverallRun()
+    _g.overall_run.scripts = scripts
+    _g.multi = len(scripts) > 1
+    _g.overall_run.overview()
+
+    for script in scripts:
+        receiver, sender = context.Pipe(duplex=False)
+        sys.stdout.flush()
+        script_path = '{}/{}.py'.format(script['path'], script['module'])
+        child = context.Process(target=_watch_worker, args=(script, sender, dependencies[script_path]))
+        child.start()
+        sender.close()
+        try:
+            temp = receiver.recv()
+        except EOFError: # The child died without sending its results.
+            temp = None
+        receiver.close()
+        child.join()
+
+        if temp:
+            _g.overall_run.script_runs.append(temp.script_runs[0])
+            if temp.complete_failures:
+                _g.overall_run.complete_failures.append(temp.complete_failures[0])
+        else:
+            run = _Run(script, 0)
+            run.errors += 1
+            run.stack_traces = ['Process running {} exited with code {}.'.format(run.path, child.exitcode)]
+            run.collect()
+            _g.overall_run.script_runs.append(run)
+            _g.overall_run.complete_failures.append(run.path)
+            print(colorama.Fore.MAGENTA + run.stack_traces[0])
+            _Newline.set(True)
+
+    _g.overall_run.collect()
+    if _g.multi:
+        _g.overall_run.summarize()
+
+
+def _watch(scripts):
+    '''
+    Resident watch mode. Runs all scripts, then polls them and the local modules they
+    import, rerunning only the affected scripts on each change. Called from go().
+    '''
+    script_paths = ['{}/{}.py'.format(script['path'], script['module']) for script in scripts]
+    dependencies = {}
+    mtimes = {}
+    affected = scripts
+    try:
+        while True:
+            if affected:
+                # Rescan before running so that changes made during the run get picked up.
+                for script_path in script_paths:
+                    dependencies[script_path] = _dependencies(script_path)
+                mtimes = {}
+                for files in dependencies.values():
+                    for file_path in files:
+                        mtimes[file_path] = _mtime(file_path)
+
+                if affected is not scripts: # Separate this run from the previous one.
+                    _Newline.make()
+                _watch_run(affected, dependencies)
+                _Newline.make()
+                print(colorama.Fore.RESET + 'Watching {} file{} for changes. Press Ctrl-C to stop.'.format(len(mtimes), _s(len(mtimes))))
+                _Newline.set(True)
+
+            time.sleep(_g.watch_interval)
+            changed = set(file_path for file_path in mtimes if _mtime(file_path) != mtimes[file_path])
+            affected = [script for script, script_path in zip(scripts, script_paths) if dependencies[script_path] & changed]
+    except KeyboardInterrupt:
+        print()
+    return _g.overall_run
+
+
+def go(paths=None, suite_file=None, recursive=None, parallel=None, minimal=None, quiet=None, timestamp=None, strip=False, watch=None, prebuild=None):
     '''
     A wrapper for _runtests. Necessary for handling parallel runs, but serial runs are
     wrapped as well. Execution starts here.
     '''
     _g.overall_run = _OverallRun()
+    _g.pid = os.getpid()
 
-    _g.overall_run.scripts, _g.clargs = _parse_cl(paths, suite_file, recursive, parallel, minimal, quiet, timestamp, strip)
+    _g.overall_run.scripts, _g.clargs = _parse_cl(paths, suite_file, recursive, parallel, minimal, quiet, timestamp, strip, watch, prebuild)
 
     colorama.init(strip=_g.clargs.strip)
 
     if _g.clargs.parallel and platform.system() == 'Windows':
         sys.exit('Parallel testing is not supported on Windows.')
 
+    if _g.clargs.watch:
+        if platform.system() == 'Windows':
+            sys.exit('Watch mode is not supported on Windows.')
+        if _g.clargs.parallel:
+            sys.exit('Watch mode cannot be combined with parallel testing.')
+        return _watch(_g.overall_run.scripts)
+
     if len(_g.overall_run.scripts) > 1:
         _g.multi = True
     _g.overall_run.overview()
 
     if _g.clargs.parallel:
         from multiprocessing import Pool
+        _prebuild_fixtures(_g.overall_run.scripts)
         _g.overall_run.scripts = _g.overall_run.scripts * int(_g.clargs.parallel)
         pool = Pool(len(_g.overall_run.scripts))
 
@@ -659,6 +1105,9 @@ def go(paths=None, suite_file=None, recursive=None, parallel=None, minimal=None,
     else:
         _runtests(_g.overall_run.scripts)
 
+    # Script values can be left over from parent-side imports in parallel runs.
+    _teardown_fixtures(['run', 'worker', 'script'])
+
     if _g.multi or _g.clargs.parallel:
         _g.overall_run.summarize()
     return _g.overall_run
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+'''
+A custom runner that checks @fixture scopes. It runs the scripts in this directory
+in parallel, serially, then in parallel with --prebuild, and counts the builds &
+teardowns logged by fixtures.py.
+
+$ python check_fixtures.py
+'''
+import os
+import shutil
+import sys
+from collections import Counter
+from cleartest import go
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+LOG = os.path.join(HERE, 'fixture_log.txt')
+CACHE = os.path.join(HERE, '.cleartest_cache')
+problems = []
+
+
+def read_log():
+    '''
+    Returns the logged (pid, event, name) tuples and clears the log.
+    '''
+    with open(LOG) as f:
+        entries = [tuple(line.split()) for line in f]
+    os.remove(LOG)
+    return [(int(pid), event, name) for pid, event, name in entries]
+
+
+def check(description, got, expected):
+    if got != expected:
+        problems.append('{}: got {}, expected {}'.format(description, got, expected))
+
+
+def count(entries, event, name, pid=None):
+    return len([e for e in entries if e[1:] == (event, name) and (pid is None or e[0] == pid)])
+
+
+def check_pairs(entries, name):
+    '''
+    Every process that built a value must tear it down itself, once.
+    '''
+    builds = Counter(pid for pid, event, n in entries if (event, n) == ('build', name))
+    teardowns = Counter(pid for pid, event, n in entries if (event, n) == ('teardown', name))
+    check('{} teardowns per process'.format(name), teardowns, builds)
+
+
+def check_parallel(parent, prebuild, cached_builds):
+    '''
+    Runs the scripts with -p 2. With prebuild the parent also imports test_alpha,
+    building its module-level script fixture one extra time.
+    '''
+    label = 'parallel{}'.format(' --prebuild' if prebuild else '')
+    parent_script_builds = 1 if prebuild else 0
+    results = go(paths=[HERE], quiet=True, parallel=2, prebuild=prebuild)
+    check(label + ' failures & errors', (results.failed, results.errors), (0, 0))
+    entries = read_log()
+    check(label + ' run builds', count(entries, 'build', 'run'), 1)
+    check(label + ' run builds in parent', count(entries, 'build', 'run', parent), 1)
+    check(label + ' worker builds in parent', count(entries, 'build', 'worker', parent), 0)
+    check(label + ' script builds in parent', count(entries, 'build', 'script', parent), parent_script_builds)
+    # Plus 1 per script instance.
+    check(label + ' script builds', count(entries, 'build', 'script'), 4 + parent_script_builds)
+    check(label + ' cached builds', count(entries, 'build', 'cached'), cached_builds)
+    for name in ('run', 'worker', 'script'):
+        check_pairs(entries, name)
+
+
+if __name__ == "__main__":
+    for path in (LOG, CACHE):
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+    parent = os.getpid()
+
+    # Parallel first, while nothing has imported fixtures.py yet, so the parent has to
+    # find it from the scripts' imports. Run values come from this process, the rest
+    # from each worker.
+    check_parallel(parent, prebuild=False, cached_builds=1)
+
+    # Serial: everything is built in this process.
+    results = go(paths=[HERE], quiet=True)
+    check('serial failures & errors', (results.failed, results.errors), (0, 0))
+    entries = read_log()
+    check('serial run builds', count(entries, 'build', 'run', parent), 1)
+    check('serial worker builds', count(entries, 'build', 'worker', parent), 1)
+    check('serial script builds', count(entries, 'build', 'script', parent), 2)
+    check('serial cached builds', count(entries, 'build', 'cached'), 0)
+    for name in ('run', 'worker', 'script'):
+        check_pairs(entries, name)
+    # Most recently built is torn down first.
+    built = [name for pid, event, name in entries if event == 'build' and name in ('run', 'worker')]
+    torn_down = [name for pid, event, name in entries if event == 'teardown' and name in ('run', 'worker')]
+    check('serial teardown order', torn_down, built[::-1])
+
+    check_parallel(parent, prebuild=True, cached_builds=0)
+
+    # Just the one picklable fixture, with no temp files or older versions left over.
+    check('cache files', len(os.listdir(CACHE)), 1)
+    shutil.rmtree(CACHE)
+
+    print()
+    if problems:
+        for problem in problems:
+            print('FAIL ' + problem)
+        sys.exit(1)
+    print('All fixture checks passed.')
@@ -0,0 +1,36 @@
+'''
+Fixtures shared by the scripts in this directory. Each one logs when it's built and
+torn down so check_fixtures.py can count them.
+'''
+import os
+from cleartest import fixture
+
+LOG = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixture_log.txt')
+
+
+def log(event, name):
+    with open(LOG, 'a') as f:
+        f.write('{} {} {}\n'.format(os.getpid(), event, name))
+
+
+@fixture(scope='run', teardown=lambda value: log('teardown', 'run'))
+def dataset():
+    log('build', 'run')
+    return list(range(10))
+
+
+@fixture(scope='worker', teardown=lambda value: log('teardown', 'worker'))
+def connection():
+    log('build', 'worker')
+    return {'pid': os.getpid()}
+
+
+@fixture(scope='run', cache=True)
+def lookup_table():
+    log('build', 'cached')
+    return {n: n * n for n in range(10)}
+
+
+@fixture(scope='run', cache=True)
+def unpicklable():
+    return lambda: 'still works'
@@ -0,0 +1,28 @@
+import os
+import sys
+
+# Make fixtures.py importable however this script is run, e.g. `runtests -r` from the repo root.
+HERE = os.path.dirname(os.path.abspath(__file__))
+if HERE not in sys.path:
+    sys.path.insert(0, HERE)
+
+from cleartest import fixture, equals
+from fixtures import dataset, connection, lookup_table, unpicklable, log
+
+
+@fixture(teardown=lambda value: log('teardown', 'script'))
+def scratch():
+    log('build', 'script')
+    return []
+
+
+# Called at import time, i.e. in the parent as well when run with --prebuild.
+scratch().append('imported')
+
+
+def test_main(plan=5):
+    equals(dataset(), list(range(10)))
+    equals(connection()['pid'], os.getpid())
+    equals(lookup_table()[3], 9)
+    equals(unpicklable()(), 'still works')
+    equals(scratch(), ['imported'])
@@ -0,0 +1,24 @@
+import os
+import sys
+
+# Make fixtures.py importable however this script is run, e.g. `runtests -r` from the repo root.
+HERE = os.path.dirname(os.path.abspath(__file__))
+if HERE not in sys.path:
+    sys.path.insert(0, HERE)
+
+from cleartest import fixture, equals
+from fixtures import dataset, connection, lookup_table, log
+
+
+@fixture(teardown=lambda value: log('teardown', 'script'))
+def scratch():
+    log('build', 'script')
+    return []
+
+
+def test_main(plan=4):
+    scratch().append('beta')
+    equals(dataset()[-1], 9)
+    equals(connection()['pid'], os.getpid())
+    equals(lookup_table()[4], 16)
+    equals(scratch(), ['beta'])